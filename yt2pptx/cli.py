@@ -1,6 +1,7 @@
 import sys
 from pathlib import Path
 import platform
+import shutil
 from os import startfile
 import subprocess
 
@@ -9,8 +10,9 @@ import yt_dlp
 from .video_utils import (
     sanitize_filename,
     extract_video_id,
+    compute_frame_hashes,
     extract_frames_ffmpeg,
-    filter_unique_images,
+    filter_unique_frames,
 )
 from .pptx_utils import create_pptx_from_images_with_timestamps
 
@@ -40,14 +42,6 @@ def download_youtube_video(
         print(f"✅ Video already downloaded: {final_path} with title '{title}'")
         return final_path, title, video_id
 
-    video_info = {}
-
-    def get_info_hook(d: dict) -> None:
-        """Hook to get video information during download."""
-        if d.get("status") == "finished":
-            video_info["title"] = d["info_dict"].get("title", "video")
-            video_info["id"] = d["info_dict"].get("id", "")
-
     ydl_opts = {
         "outtmpl": str(final_path),
         "format": "/".join(
@@ -57,21 +51,25 @@ def download_youtube_video(
             ]  # ][::-1]
         ),
         "merge_output_format": "mp4",
-        "progress_hooks": [get_info_hook],
+        "concurrent_fragment_downloads": 8,
+        # Progressive formats are fetched in ranged chunks, and resumed per chunk on errors
+        "http_chunk_size": 10 * 1024 * 1024,
         "quiet": True,
         # "sub_langs": "zh-Hans",
     }
+    if shutil.which("aria2c"):
+        # aria2c splits progressive downloads over multiple connections. DASH and HLS
+        # fragments stay with the native downloader and concurrent_fragment_downloads.
+        ydl_opts["external_downloader"] = {"http": "aria2c"}
+        ydl_opts["external_downloader_args"] = {
+            "aria2c": ["-x", "16", "-s", "16", "-k", "1M"]
+        }
     print("🔽 Downloading video...")
 
+    # A single extract_info call both downloads the video and returns its metadata
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:  # pyright: ignore[reportArgumentType]
         info = ydl.extract_info(input_url_or_id, download=True)
-        if info is not None:
-            video_info["title"] = info.get("title", "video")
-            video_info["id"] = info.get("id", "")
-        else:
-            video_info["title"] = "video"
-            video_info["id"] = ""
-    title = sanitize_filename(str(video_info["title"]))
+    title = sanitize_filename(str((info or {}).get("title", "video")))
     title_file.write_text(title, encoding="utf-8")
 
     return final_path, title, video_id
@@ -87,14 +85,20 @@ def youtube_to_pptx_cache_frames(
     video_id = video_file.stem
     frames_folder = out_dir / video_id
 
-    print(f"🎞 Extracting frames using interval: {fps_interval} seconds")
-    extracted_images = extract_frames_ffmpeg(
-        video_file, frames_folder, interval_seconds=fps_interval
+    print(f"🎞 Sampling frames using interval: {fps_interval} seconds")
+    frame_hashes = compute_frame_hashes(
+        video_file,
+        interval_seconds=fps_interval,
+        cache_file=frames_folder / f".dhash_{fps_interval}s.npz",
     )
     print("🧹 Filtering duplicate frames...")
-    unique_images, _ = filter_unique_images(extracted_images, fps_interval=fps_interval)
+    unique_indices, _ = filter_unique_frames(frame_hashes, fps_interval=fps_interval)
 
-    print("🧾 Creating PowerPoint...")
+    # Frames are extracted lazily, while the PowerPoint pictures are being prepared
+    print("🧾 Extracting unique frames and creating PowerPoint...")
+    unique_images = extract_frames_ffmpeg(
+        video_file, frames_folder, fps_interval, unique_indices
+    )
     create_pptx_from_images_with_timestamps(
         unique_images, pptx_output, video_id, video_path=video_file
     )
@@ -1,6 +1,16 @@
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import multiprocessing
+import os
 from pathlib import Path
 
+from PIL import Image
 from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.parts.image import Image as PptxImage, ImagePart
+from pptx.slide import Slide
 from pptx.util import Inches, Length, Pt
 from pptx.enum.shapes import MSO_SHAPE
 from pptx.enum.text import PP_ALIGN, MSO_VERTICAL_ANCHOR
@@ -9,13 +19,143 @@ from tqdm import tqdm
 
 from .video_utils import timestamp_to_seconds
 
+MAX_PICTURE_SIZE = (1280, 720)  # Slides typically render at about 960x540
+
+# Slide layout and styles shared by every slide
+ORIGIN = Inches(0)
+LINK_LEFT = Inches(0.3)
+LINK_WIDTH = Inches(3)
+LINK_HEIGHT = Inches(0.5)
+LINK_FONT_SIZE = Pt(12)
+LINK_COLOR = RGBColor(0, 102, 204)
+BTN_HEIGHT = Inches(0.5)
+BTN_WIDTH = Inches(0.5)
+BTN_SPACING = Inches(0.1)  # Slight spacing above text
+BTN_FONT_SIZE = Pt(16)
+BTN_TEXT_COLOR = RGBColor(255, 255, 255)  # White text
+BTN_FILL_COLOR = RGBColor(70, 130, 180)  # Steel blue
+BTN_LINE_COLOR = RGBColor(0, 0, 0)  # Black border
+
+
+def _prepare_picture(img_path: Path) -> bytes:
+    """Downscale an image to fit MAX_PICTURE_SIZE and re-encode it as JPEG in memory.
+
+    This runs in worker processes, so it returns plain bytes that are cheap to pickle.
+
+    Args:
+        img_path (Path): The path to the image file.
+
+    Returns:
+        bytes: The JPEG bytes, ready to be embedded in a slide.
+    """
+    buf = BytesIO()
+    with Image.open(img_path) as img:
+        img.thumbnail(MAX_PICTURE_SIZE, Image.Resampling.LANCZOS)
+        img.save(buf, "JPEG", quality=82, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _add_picture(
+    slide: Slide,
+    picture: PptxImage,
+    image_idx: int,
+    left: Length,
+    top: Length,
+    width: Length | None,
+) -> None:
+    """Add a picture like `slide.shapes.add_picture`, without scanning the package.
+
+    python-pptx walks every relationship in the package to reuse an identical image,
+    and every part to number the new one, which makes building a deck quadratic in
+    the number of slides. Extracted frames are all distinct, so the image part is
+    created directly instead. This relies on python-pptx internals, which is why
+    python-pptx is pinned to 1.0.x.
+
+    Args:
+        slide (Slide): The slide to add the picture to.
+        picture (PptxImage): The image to embed.
+        image_idx (int): The unused sequence number of the image part in the package.
+        left (Length): The left position of the picture.
+        top (Length): The top position of the picture.
+        width (Length | None): The width of the picture, keeping its aspect ratio.
+    """
+    partname = PackURI(f"/ppt/media/image{image_idx}.{picture.ext}")
+    image_part = ImagePart(
+        partname,
+        picture.content_type,
+        slide.part.package,
+        picture.blob,
+        picture.filename,
+    )
+    rId = slide.part.relate_to(image_part, RT.IMAGE)
+    slide.shapes._add_pic_from_image_part(  # pyright: ignore[reportPrivateUsage]
+        image_part, rId, left, top, width, None
+    )
+
+
+def _add_hyperlink_textbox(slide: Slide, text: str, address: str, top: Length) -> None:
+    """Add a single-line textbox linking to an address, styled like a hyperlink.
+
+    Args:
+        slide (Slide): The slide to add the textbox to.
+        text (str): The text of the link.
+        address (str): The URL the link points to.
+        top (Length): The top position of the textbox.
+    """
+    textbox = slide.shapes.add_textbox(LINK_LEFT, top, LINK_WIDTH, LINK_HEIGHT)
+    p = textbox.text_frame.paragraphs[0]
+
+    run = p.add_run()
+    run.text = text
+    font = run.font
+    font.size = LINK_FONT_SIZE
+    font.bold = True
+    font.underline = True
+    font.color.rgb = LINK_COLOR
+    run.hyperlink.address = address
+
+
+def _add_play_button(slide: Slide, command: str, top: Length) -> None:
+    """Add a rounded play button that runs a command when clicked.
+
+    Args:
+        slide (Slide): The slide to add the button to.
+        command (str): The path of the command run by the button.
+        top (Length): The top position of the button.
+    """
+    btn = slide.shapes.add_shape(
+        MSO_SHAPE.ROUNDED_RECTANGLE,
+        LINK_LEFT,
+        top,
+        BTN_WIDTH,
+        BTN_HEIGHT,
+    )
+    btn.text = f"▶"
+
+    # Style text
+    text_frame = btn.text_frame
+    # Vertical centering
+    text_frame.vertical_anchor = MSO_VERTICAL_ANCHOR.MIDDLE
+
+    p = text_frame.paragraphs[0]
+    # Horizontal centering
+    p.alignment = PP_ALIGN.CENTER
+    p.font.size = BTN_FONT_SIZE
+    p.font.bold = True
+    p.font.color.rgb = BTN_TEXT_COLOR
+    btn.fill.solid()
+    btn.fill.fore_color.rgb = BTN_FILL_COLOR
+    btn.line.color.rgb = BTN_LINE_COLOR
+
+    btn.click_action.hyperlink.address = command
+
 
 def create_pptx_from_images_with_timestamps(
-    image_paths: list[Path],
+    image_paths: Iterable[Path],
     output_pptx: Path,
     video_id: str,
     *,
-    video_path: Path,
+    video_path: Path | None = None,
 ) -> None:
     """Create a PowerPoint presentation from a list of images with timestamps.
 
@@ -24,86 +164,72 @@ def create_pptx_from_images_with_timestamps(
     an image and a hyperlink to the YouTube video at the specified timestamp.
 
     Args:
-        image_paths (list[Path]): A list of paths to the image file.
+        image_paths (Iterable[Path]): Paths to the image files. Pictures are prepared
+        as soon as each path is produced, so this can be a generator such as
+        `extract_frames_ffmpeg`.
         output_pptx (Path): The path where the PowerPoint file will be saved.
         video_id (str): The YouTube video ID to create hyperlinks for the timestamps.
+        video_path (Path | None, optional): The local video file. If given, each slide
+        also gets a button playing it from the timestamp with ffplay. Defaults to None.
     """
     prs = Presentation()
     blank_slide_layout = prs.slide_layouts[6]
-    for img_path in tqdm(image_paths, desc="Creating slides"):
-        slide = prs.slides.add_slide(blank_slide_layout)
-        slide.shapes.add_picture(
-            str(img_path), Inches(0), Inches(0), width=prs.slide_width
-        )
-
-        timestamp = img_path.stem.split("_")[-1].replace("-", ":")
-        zero_hours = "0:"
-        if timestamp.startswith(zero_hours):
-            timestamp = timestamp[len(zero_hours) :]
-        seconds = timestamp_to_seconds(timestamp)
-
-        youtube_link = f"https://www.youtube.com/watch?v={video_id}&t={seconds}s"
-        youtube_cmd = None
-        if video_path:
-            bat_path = img_path.with_suffix(".bat")
-            bat_path.write_text(
-                f"@echo off\n"
-                f'ffplay -ss {seconds} -i "{video_path.absolute()}" -x 1920 -loglevel quiet\n'  # -x 1920
-            )
-            youtube_cmd = str(bat_path.absolute())
-
-        left = Inches(0.3)
-        top = (
-            Length(prs.slide_height - Inches(0.7)) if prs.slide_height else Inches(0.5)
-        )
-        width = Inches(3)
-        height = Inches(0.5)
-        textbox = slide.shapes.add_textbox(left, top, width, height)
-        text_frame = textbox.text_frame
-        p = text_frame.paragraphs[0]
-
-        run = p.add_run()
-        run.text = f"Jump to {timestamp}"
-        font = run.font
-        font.size = Pt(12)
-        font.bold = True
-        font.underline = True
-        font.color.rgb = RGBColor(0, 102, 204)
-        run.hyperlink.address = youtube_link
-
-        if youtube_cmd:
-            btn_height = Inches(0.5)
-            btn_width = Inches(0.5)
-            btn_top = Length(
-                top - btn_height - Inches(0.1)
-            )  # Slight spacing above text
-            btn = slide.shapes.add_shape(
-                MSO_SHAPE.ROUNDED_RECTANGLE,
-                left,
-                btn_top,
-                btn_width,
-                btn_height,
-            )
-            btn.text = f"▶"
-
-            # Style text
-            text_frame = btn.text_frame
-            # Vertical centering
-            text_frame.vertical_anchor = MSO_VERTICAL_ANCHOR.MIDDLE
 
-            p = text_frame.paragraphs[0]
-            # Horizontal centering
-            p.alignment = PP_ALIGN.CENTER
-
-            p = btn.text_frame.paragraphs[0]
-            p.font.size = Pt(16)
-            p.font.bold = True
-            p.font.color.rgb = RGBColor(255, 255, 255)  # White text
-            btn.fill.solid()
-            btn.fill.fore_color.rgb = RGBColor(70, 130, 180)  # Steel blue
-            btn.line.color.rgb = RGBColor(0, 0, 0)  # Black border
-
-            btn.click_action.hyperlink.address = youtube_cmd
+    # Only the vertical positions depend on the presentation
+    slide_width = prs.slide_width
+    top = Length(prs.slide_height - Inches(0.7)) if prs.slide_height else Inches(0.5)
+    btn_top = Length(top - BTN_HEIGHT - BTN_SPACING)
+    video_abspath = video_path.absolute() if video_path else None
+    add_slide = prs.slides.add_slide
+    first_image_idx = prs.part.package.next_image_partname("jpg").idx or 1
+
+    # Pictures are re-encoded in parallel as paths arrive, slides are then built in order.
+    # Workers are spawned rather than forked, since `image_paths` may be starting ffmpeg
+    # from threads, and a fork in the middle of that can leave `subprocess` hanging.
+    with ProcessPoolExecutor(
+        mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        pictures = [(p, executor.submit(_prepare_picture, p)) for p in image_paths]
+        for i, (img_path, picture) in enumerate(tqdm(pictures, desc="Creating slides")):
+            slide = add_slide(blank_slide_layout)
+            _add_picture(
+                slide,
+                PptxImage.from_blob(picture.result(), img_path.name),
+                first_image_idx + i,
+                ORIGIN,
+                ORIGIN,
+                slide_width,
+            )
 
-    prs.save(str(output_pptx))
+            timestamp = img_path.stem.split("_")[-1].replace("-", ":")
+            zero_hours = "0:"
+            if timestamp.startswith(zero_hours):
+                timestamp = timestamp[len(zero_hours) :]
+            seconds = timestamp_to_seconds(timestamp)
+
+            youtube_link = f"https://www.youtube.com/watch?v={video_id}&t={seconds}s"
+            youtube_cmd = None
+            if video_abspath:
+                bat_path = img_path.with_suffix(".bat")
+                bat_script = (
+                    f"@echo off\n"
+                    f'ffplay -ss {seconds} -i "{video_abspath}" -x 1920 -loglevel quiet\n'  # -x 1920
+                )
+                # Scripts kept from a previous run are left untouched
+                if not bat_path.exists() or bat_path.read_text() != bat_script:
+                    bat_path.write_text(bat_script)
+                youtube_cmd = str(bat_path.absolute())
+
+            _add_hyperlink_textbox(slide, f"Jump to {timestamp}", youtube_link, top)
+            if youtube_cmd:
+                _add_play_button(slide, youtube_cmd, btn_top)
+
+    # Save next to the output and swap it in, so an open or previous deck is never
+    # left half-written if saving fails
+    tmp_pptx = output_pptx.with_name(f"{output_pptx.name}.tmp")
+    try:
+        prs.save(str(tmp_pptx))
+        os.replace(tmp_pptx, output_pptx)
+    finally:
+        tmp_pptx.unlink(missing_ok=True)
     print(f"✅ PowerPoint saved: {output_pptx}")
@@ -1,12 +1,21 @@
+import math
+import os
 import re
 import subprocess
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
-import statistics
 
-from PIL import Image
-import imagehash
+import numpy as np
 from tqdm import tqdm
 
+INVALID_FILENAME_CHARS = re.compile(r'[\\/*?:"<>|]')
+VIDEO_ID_RE = re.compile(r"[A-Za-z0-9_-]{11}")
+VIDEO_ID_URL_PATTERNS = [
+    re.compile(r"(?:v=|\/)([A-Za-z0-9_-]{11})(?:[&?\/]|$)"),
+]
+
 
 def sanitize_filename(name: str) -> str:
     """Sanitize a filename by replacing invalid characters with underscores.
@@ -20,7 +29,7 @@ def sanitize_filename(name: str) -> str:
     Returns:
         str: Sanitized filename with invalid characters replaced by underscores.
     """
-    return re.sub(r'[\\/*?:"<>|]', "_", name)
+    return INVALID_FILENAME_CHARS.sub("_", name)
 
 
 def make_timestamp(timestamp: int, *, is_filename=False) -> str:
@@ -37,19 +46,14 @@ def make_timestamp(timestamp: int, *, is_filename=False) -> str:
     Returns:
         str: Formatted timestamp string.
     """
-    hour = timestamp // 3600
-    format_dict = {
-        "h": hour,
-        "m": (timestamp % 3600) // 60,
-        "s": timestamp % 60,
-        "x": "-" if is_filename else ":",
-    }
-
-    format_string = "{h:d}{x}{m:02d}{x}{s:02d}"
-    if not is_filename and hour == 0:
-        format_string = "{m:d}{x}{s:02d}"
+    hour, rest = divmod(timestamp, 3600)
+    minute, second = divmod(rest, 60)
+    if is_filename:
+        return f"{hour:d}-{minute:02d}-{second:02d}"
+    if hour == 0:
+        return f"{minute:d}:{second:02d}"
 
-    return format_string.format(**format_dict)
+    return f"{hour:d}:{minute:02d}:{second:02d}"
 
 
 def timestamp_to_seconds(timestamp: str, separator: str = ":") -> int:
@@ -79,26 +83,28 @@ def timestamp_to_seconds(timestamp: str, separator: str = ":") -> int:
         raise ValueError(f"Invalid timestamp format: {timestamp}")
 
 
-def sort_timestamp(k: Path) -> str:
-    """Extract and format the timestamp from a filename for sorting purposes.
+def sort_timestamp(k: str | os.PathLike[str]) -> tuple[float, str]:
+    """Extract the timestamp from a filename for sorting purposes.
 
     This function assumes the filename contains a timestamp in the format
     "h-mm-ss" or "m-ss", where 'h' is hours, 'm' is minutes, and 's' is seconds.
-    If the timestamp is not present, it returns the original filename.
+    If no timestamp is found, the file is sorted after all timestamped ones.
+    It works on plain strings, so entries from `os.scandir` can be sorted
+    without building a Path for each of them.
 
     Args:
-        k (Path): The Path object representing the file.
+        k (str | os.PathLike[str]): The filename, path or `os.DirEntry` of the file.
 
     Returns:
-        str: Formatted timestamp string that can be used for sorting,
-        or the original filename if no timestamp is found.
+        tuple[float, str]: The timestamp in seconds, or infinity if no timestamp
+        is found, followed by the original filename to break ties.
     """
-    timestamp = k.name.split("_").pop()
-    if not timestamp:
-        return k.name
-    h, x = timestamp.split("-", 1)
-
-    return f"{int(h):04d}-{x}"
+    name = os.path.basename(k)
+    timestamp = os.path.splitext(name)[0].split("_").pop()
+    try:
+        return timestamp_to_seconds(timestamp, separator="-"), name
+    except ValueError:
+        return math.inf, name
 
 
 def extract_video_id(input_url_or_id: str) -> str:
@@ -114,74 +120,304 @@ def extract_video_id(input_url_or_id: str) -> str:
     Returns:
         str: The extracted YouTube video ID if found, otherwise an empty string.
     """
-    if re.fullmatch(r"[A-Za-z0-9_-]{11}", input_url_or_id):
+    if VIDEO_ID_RE.fullmatch(input_url_or_id):
         return input_url_or_id
-    patterns = [
-        r"(?:v=|\/)([A-Za-z0-9_-]{11})(?:[&?\/]|$)",
-    ]
-    for pat in patterns:
-        m = re.search(pat, input_url_or_id)
+    for pat in VIDEO_ID_URL_PATTERNS:
+        m = pat.search(input_url_or_id)
         if m:
             return m.group(1)
 
     return ""
 
 
-def extract_frames_ffmpeg(
-    video_path: Path, frame_dir: Path, interval_seconds: int
-) -> list[Path]:
-    """Extract frames from a video file using ffmpeg.
+HASH_SIZE = 8  # Hashes are HASH_SIZE x HASH_SIZE bits
+# Size of the grayscale frames streamed for hashing, with one extra column for dHash
+HASH_FRAME_WIDTH = HASH_SIZE + 1
+HASH_FRAME_HEIGHT = HASH_SIZE
+HASH_CACHE_VERSION = 2  # Bump whenever cached hashes of the same settings would differ
+
+
+def _iter_raw_frame_batches(
+    ffmpeg_cmd: list, frame_bytes: int, batch_size: int
+) -> Iterator[np.ndarray]:
+    """Run ffmpeg and yield batches of fixed-size raw frames read from its stdout.
+
+    The pipe is read straight into a single reused buffer, so no object is allocated
+    per frame. Each yielded array is a view of that buffer, and is only valid until
+    the next batch is read.
+
+    Args:
+        ffmpeg_cmd (list): The ffmpeg command, writing raw video to stdout.
+        frame_bytes (int): Size in bytes of a single raw frame.
+        batch_size (int): Maximum number of frames in a batch.
+
+    Yields:
+        np.ndarray: Array of shape (N, frame_bytes) of uint8 pixels, in order.
+    Raises:
+        subprocess.CalledProcessError: If the ffmpeg command fails to execute.
+    """
+    buf = bytearray(frame_bytes * batch_size)
+    view = memoryview(buf)
+    with subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, bufsize=0) as proc:
+        assert proc.stdout is not None
+        while True:
+            # Unbuffered pipe reads may be short, so fill the buffer up to EOF
+            filled = 0
+            while filled < len(buf) and (n := proc.stdout.readinto(view[filled:])):
+                filled += n
+            if n_frames := filled // frame_bytes:
+                frames = np.frombuffer(buf, np.uint8, n_frames * frame_bytes)
+                yield frames.reshape(n_frames, frame_bytes)
+            if filled < len(buf):
+                break
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, ffmpeg_cmd)
+
+
+def _difference_hashes(frames: np.ndarray) -> np.ndarray:
+    """Compute the 64-bit difference hashes of a batch of grayscale frames at once.
+
+    Every pixel brighter than its left neighbour sets one bit of the hash, the same
+    way as `imagehash.dhash` does once the frame is downscaled to 8x9.
+
+    Args:
+        frames (np.ndarray): Array of shape (N, HASH_FRAME_HEIGHT, HASH_FRAME_WIDTH) of uint8 pixels.
+
+    Returns:
+        np.ndarray: Array of shape (N,) of uint64 hashes.
+    """
+    n = frames.shape[0]
+    bits = (frames[:, :, 1:] > frames[:, :, :-1]).reshape(n, HASH_SIZE * HASH_SIZE)
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
 
-    This function uses ffmpeg to extract frames from a video file at specified intervals.
-    It saves the frames in a specified directory with a naming pattern that includes the timestamp
-    in the format "frame_h-mm-ss.jpg".
-    The frames are extracted at a rate of one frame every `interval_seconds`.
+
+def _hamming_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Count the differing bits between 64-bit hashes, element-wise."""
+    # A single popcount per element, without unpacking 64 bytes out of every hash
+    return np.bitwise_count(np.bitwise_xor(a, b))
+
+
+def compute_frame_hashes(
+    video_path: Path,
+    interval_seconds: int,
+    *,
+    batch_size: int = 256,
+    cache_file: Path | None = None,
+) -> np.ndarray:
+    """Compute perceptual hashes of frames sampled from a video file.
+
+    This function asks ffmpeg to sample one frame every `interval_seconds`, downscale it
+    to the 9x8 grayscale pixels a hash is made of and write them to stdout. Frames are hashed
+    in memory in batches of `batch_size` with NumPy, so no image file is written to disk.
+
+    If `cache_file` is given, the hashes are saved to it, and loaded back instead of
+    running ffmpeg again as long as the video file and the sampling settings match.
 
     ffmpeg is required to be installed and available in the system PATH.
 
     Args:
-        video_path (Path): Path to the video file from which frames will be extracted.
-        frame_dir (Path): Directory where the extracted frames will be saved.
-        interval_seconds (int): Interval in seconds at which frames will be extracted.
+        video_path (Path): Path to the video file from which frames will be sampled.
+        interval_seconds (int): Interval in seconds at which frames will be sampled.
+        batch_size (int, optional): Number of frames hashed at once. Defaults to 256.
+        cache_file (Path | None, optional): Path of the `.npz` file caching the hashes.
+        Defaults to None.
 
     Returns:
-        list[Path]: A list of Path objects representing the extracted frames.
+        np.ndarray: The uint64 difference hash of each sampled frame, in order.
     Raises:
         subprocess.CalledProcessError: If the ffmpeg command fails to execute.
     """
-    temp_pattern = frame_dir / "frame_%04d.jpg"
+    # The video size and mtime stand in for its content, which is too slow to hash
+    video_stat = video_path.stat()
+    cache_key = np.array(
+        [
+            video_stat.st_size,
+            video_stat.st_mtime_ns,
+            interval_seconds,
+            HASH_FRAME_WIDTH,
+            HASH_FRAME_HEIGHT,
+            HASH_CACHE_VERSION,
+        ],
+        dtype=np.int64,
+    )
+    if cache_file and cache_file.exists():
+        with np.load(cache_file) as cached:
+            if np.array_equal(cached["key"], cache_key):
+                print(f"✅ Frame hashes already computed: {cache_file}")
+                return cached["hashes"]
+
+    # Keep the first frame at or after each multiple of the interval, which is the frame
+    # `extract_frame_at` seeks to, and let fps number the samples from 0. An interval
+    # without any frame repeats the previous sample, which is never kept as unique.
+    slot = f"floor(t/{interval_seconds})"
+    prev_slot = f"floor(prev_selected_t/{interval_seconds})"
+    sample_filter = (
+        f"select='isnan(prev_selected_t)+gt({slot},{prev_slot})',"
+        f"fps=1/{interval_seconds}:round=down:start_time=0"
+    )
+    width, height = HASH_FRAME_WIDTH, HASH_FRAME_HEIGHT
     ffmpeg_cmd = [
         "ffmpeg",
+        "-nostdin",
         "-loglevel",
         "error",
         "-i",
         video_path,
         "-vf",
-        f"fps=1/{interval_seconds}",
+        # Drop chroma before scaling, and box-average pixels straight into hash cells
+        f"{sample_filter},format=gray,scale={width}:{height}:flags=area",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "gray",
+        "-",
+    ]
+    hash_batches: list[np.ndarray] = []
+    with tqdm(desc="Hashing frames", unit="frame") as progress:
+        for frames in _iter_raw_frame_batches(ffmpeg_cmd, width * height, batch_size):
+            hash_batches.append(_difference_hashes(frames.reshape(-1, height, width)))
+            progress.update(len(frames))
+
+    hashes = np.concatenate(hash_batches) if hash_batches else np.empty(0, np.uint64)
+    if cache_file:
+        np.savez(cache_file, key=cache_key, hashes=hashes)
+
+    return hashes
+
+
+def extract_frame_at(video_path: Path, seconds: int, frame_path: Path) -> Path:
+    """Extract a single frame of a video file at a given time using ffmpeg.
+
+    The seek is placed before the input, so ffmpeg jumps to the closest keyframe
+    and only decodes from there to the requested time. The first frame at or after
+    `seconds` is saved, which is the frame `compute_frame_hashes` samples there.
+
+    ffmpeg is required to be installed and available in the system PATH.
+
+    Args:
+        video_path (Path): Path to the video file from which the frame will be extracted.
+        seconds (int): Time of the frame in seconds.
+        frame_path (Path): Path where the frame will be saved as JPEG.
+
+    Returns:
+        Path: The path of the extracted frame.
+    Raises:
+        subprocess.CalledProcessError: If the ffmpeg command fails to execute.
+    """
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-ss",
+        str(seconds),
+        "-i",
+        video_path,
+        "-frames:v",
+        "1",
         "-q:v",
         "2",
-        str(temp_pattern),
+        "-update",
+        "1",
+        "-y",
+        frame_path,
     ]
     subprocess.run(ffmpeg_cmd, check=True)
+    return frame_path
+
+
+def extract_frames_ffmpeg(
+    video_path: Path,
+    frame_dir: Path,
+    interval_seconds: int,
+    frame_indices: list[int],
+    *,
+    max_workers: int | None = None,
+) -> Iterator[Path]:
+    """Extract selected frames from a video file using ffmpeg.
+
+    This function saves only the frames sampled by `compute_frame_hashes` whose index
+    is listed in `frame_indices`, so duplicate frames are never decoded twice or encoded.
+    Each frame is extracted with a fast seek by `extract_frame_at`, which only decodes
+    a few seconds of video instead of the whole video again.
+    The frames are saved in a specified directory with a naming pattern that includes
+    the timestamp in the format "h-mm-ss.jpg".
+
+    Frames are extracted by parallel ffmpeg processes, and each one is yielded as soon
+    as it and the frames before it are saved, so that consumers can start working
+    while later frames are extracted.
+
+    ffmpeg is required to be installed and available in the system PATH.
+
+    Args:
+        video_path (Path): Path to the video file from which frames will be extracted.
+        frame_dir (Path): Directory where the extracted frames will be saved.
+        interval_seconds (int): Interval in seconds at which frames were sampled.
+        frame_indices (list[int]): Sorted indices of the sampled frames to extract.
+        max_workers (int | None, optional): Maximum number of concurrent ffmpeg
+        processes. Defaults to None, for the number of CPUs.
 
-    return sorted(frame_dir.glob("frame_[0-9][0-9][0-9][0-9].jpg"))
+    Yields:
+        Path: The path of each extracted frame, in order.
+    Raises:
+        subprocess.CalledProcessError: If the ffmpeg command fails to execute.
+    """
+    if not frame_indices:
+        return
+
+    # Frames are written straight to their final names instead of being renamed
+    seconds = [idx * interval_seconds for idx in frame_indices]
+    frame_paths = [
+        frame_dir / f"{make_timestamp(sec, is_filename=True)}.jpg" for sec in seconds
+    ]
 
+    # The processes mostly wait on ffmpeg, so threads are enough to run them
+    with ThreadPoolExecutor(max_workers or os.cpu_count()) as executor:
+        yield from executor.map(
+            extract_frame_at, repeat(video_path), seconds, frame_paths
+        )
+
+
+def _select_unique(hashes: list[int], threshold: int) -> list[int]:
+    """Select frames differing from the last kept one by more than `threshold` bits.
+
+    Args:
+        hashes (list[int]): 64-bit hashes of the frames, as plain Python ints so that
+        each comparison is a single XOR and popcount.
+        threshold (int): Maximum number of differing bits for a frame to be a duplicate.
 
-def filter_unique_images(
-    image_paths: list[Path],
+    Returns:
+        list[int]: Indices of the kept frames, always starting with the first frame.
+    """
+    if not hashes:
+        return []
+
+    unique_indices = [0]
+    last_hash = hashes[0]
+    for idx in range(1, len(hashes)):
+        curr_hash = hashes[idx]
+        if (curr_hash ^ last_hash).bit_count() > threshold:
+            unique_indices.append(idx)
+            last_hash = curr_hash
+
+    return unique_indices
+
+
+def filter_unique_frames(
+    hashes: np.ndarray,
     fps_interval: int,
     *,  # This allows for future extensibility without breaking the function signature
     hash_diff_threshold: int | None = None,
-) -> tuple[list[Path], int]:
-    """Filter unique images based on perceptual hashing.
+) -> tuple[list[int], int]:
+    """Filter unique frames based on perceptual hashing.
 
-    This function computes the average perceptual hash for each image in the provided list.
-    It then compares the hashes of consecutive images to determine if they are unique
+    This function compares the hashes of consecutive frames to determine if they are unique
     based on a specified threshold. If the difference between hashes is greater than the
-    threshold, the image is considered unique and added to the result list.
+    threshold, the frame is considered unique and its index is added to the result list.
 
     Args:
-        image_paths (list[Path]): List of image file paths to be processed.
+        hashes (np.ndarray): uint64 perceptual hashes of the sampled frames,
+        such as the ones returned by `compute_frame_hashes`.
         fps_interval (int): Interval in seconds for the frame rate, used to calculate timestamps.
 
         hash_diff_threshold (int | None, optional): Threshold for hash difference to consider images unique.
@@ -189,68 +425,34 @@ def filter_unique_images(
         Defaults to None.
 
     Returns:
-        list[Path]: A list of path to a unique images after filtering duplicates.
+        list[int]: A list of indices of the unique frames after filtering duplicates.
         int: The hash difference threshold calculated or provided.
-    Raises:
-        ValueError: If no images are provided in the image_paths list.
-        statistics.StatisticsError: If there is not enough data to calculate mean or standard deviation.
     """
-    hashes: list[tuple[Path, imagehash.ImageHash, int]] = []
-    for idx, path in enumerate(tqdm(image_paths, desc="Hashing images")):
-        with Image.open(path) as img:
-            hash_obj = imagehash.average_hash(img)
-            hashes.append((path, hash_obj, idx))
     if hash_diff_threshold is None and len(hashes) > 1:
-        diffs = [
-            int(abs(hashes[i][1] - hashes[i - 1][1])) for i in range(1, len(hashes))
-        ]
-        mean = statistics.mean(diffs)
-        stdev = statistics.stdev(diffs) if len(diffs) > 1 else 0
+        diffs = _hamming_distances(hashes[1:], hashes[:-1])
+        mean = float(diffs.mean())
+        stdev = float(diffs.std(ddof=1)) if diffs.size > 1 else 0.0
         hash_diff_threshold = max(1, int(mean / 2))
         print(
             f"ℹ️ Auto-calculated hash_diff_threshold: {hash_diff_threshold} using mean/2 with mean={mean:.2f} and stdev={stdev:.2f}"
         )
     elif hash_diff_threshold is None:
-        hash_diff_threshold = 5
+        hash_diff_threshold = 7
         print(f"ℹ️ Using default hash_diff_threshold: {hash_diff_threshold}")
 
-    unique_images: list[Path] = []
-    last_hash: imagehash.ImageHash | None = None
-    duplicate_start: int | None = None
-    duplicate_end: int | None = None
-
-    duplicate_interval_list: list[tuple[str, str]] = []
-
-    def calculated_removed_duplicates():
-        nonlocal duplicate_start, duplicate_end
-        if duplicate_start is not None and duplicate_end is not None:
-            start_sec = (duplicate_start - 1) * fps_interval
-            end_sec = duplicate_end * fps_interval
-            start_ts = make_timestamp(start_sec)
-            end_ts = make_timestamp(end_sec)
-            duplicate_interval_list.append((start_ts, end_ts))
-
-            duplicate_start = None
-            duplicate_end = None
-
-    for frame_path, curr_hash, idx in hashes:
-        if last_hash is None or abs(curr_hash - last_hash) > hash_diff_threshold:
-            calculated_removed_duplicates()
-
-            timestamp = make_timestamp(idx * fps_interval, is_filename=True)
-            new_name = f"{timestamp}.jpg"
-            new_path = frame_path.with_name(new_name)
-            if new_path.exists():
-                new_path.unlink()
-            frame_path.rename(new_path)
-            unique_images.append(new_path)
-            last_hash = curr_hash
-        else:
-            frame_path.unlink()
-            if duplicate_start is None:
-                duplicate_start = idx
-            duplicate_end = idx
-    calculated_removed_duplicates()
+    # A frame with the same hash as the previous one is always a duplicate, whether the
+    # previous one was kept or not, so only frames where the hash changes are compared
+    changed = np.flatnonzero(hashes[1:] != hashes[:-1]) + 1
+    candidates = np.concatenate(([0], changed)) if len(hashes) else changed
+    kept = _select_unique(hashes[candidates].tolist(), hash_diff_threshold)
+    unique_indices: list[int] = candidates[kept].tolist()
+
+    # Frames between two kept frames are the removed duplicates of the first one
+    duplicate_interval_list: list[tuple[str, str]] = [
+        (make_timestamp(start * fps_interval), make_timestamp((end - 1) * fps_interval))
+        for start, end in zip(unique_indices, unique_indices[1:] + [len(hashes)])
+        if end - start > 1
+    ]
 
     if duplicate_interval_list:
         print("🗑️ Removed duplicate frames:")
@@ -268,4 +470,4 @@ def filter_unique_images(
                 + (" / " if i < n_chunks - 1 else "")
             )
 
-    return unique_images, hash_diff_threshold
+    return unique_indices, hash_diff_threshold